@@ -3,7 +3,16 @@
 import networkx as nx
 import numpy as np
 import itertools
-from .calculate_Rs import calculate_Rs
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from .calculate_Rs import (calculate_Rs, calculate_Rs_unweighted,
+                           calculate_laplacian_pseudoinverse, _calculate_Rs_nothrow,
+                           _is_unweighted, _rs_from_resistances)
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; the NumPy batch scoring is used without it
+    njit = None
 
 def reconstruct_vascular_network(adj_matrix):
     """
@@ -14,25 +23,195 @@ def reconstruct_vascular_network(adj_matrix):
     vessel segments.
 
     Args:
-        adj_matrix (np.ndarray): A square NumPy array representing the
-                                 adjacency matrix of the vascular network.
+        adj_matrix (np.ndarray or scipy.sparse matrix): A square matrix
+                                 representing the adjacency matrix of the
+                                 vascular network. Sparse input is never
+                                 converted to a dense array.
 
     Returns:
         nx.Graph: A NetworkX graph object representing the network.
     """
-    G = nx.from_numpy_array(adj_matrix)
+    A = sp.csr_matrix(adj_matrix)
     
     # Ensure the graph is connected. In a real scenario, we would only
     # analyze the largest connected component of the tumor vasculature.
-    if not nx.is_connected(G):
-        # Get the largest connected component subgraph
-        largest_cc = max(nx.connected_components(G), key=len)
-        G = G.subgraph(largest_cc).copy()
+    n_components, labels = connected_components(A, directed=False)
+    if n_components > 1:
+        # Slice out the largest connected component before building the graph,
+        # keeping the original node indices as labels
+        largest_cc = np.flatnonzero(labels == np.bincount(labels).argmax())
+        G = nx.from_scipy_sparse_array(A[largest_cc][:, largest_cc])
+        G = nx.relabel_nodes(G, dict(enumerate(largest_cc.tolist())))
         print("Warning: Input matrix resulted in a disconnected graph. "
               "Using the largest connected component.")
+    else:
+        G = nx.from_scipy_sparse_array(A)
               
     return G
 
+def _csr_positions(A, rows, cols):
+    """
+    Returns the indices into `A.data` of the stored entries (rows[k], cols[k]).
+
+    Args:
+        A (scipy.sparse.csr_matrix): A CSR matrix with sorted indices.
+        rows (list): Row index of each entry.
+        cols (list): Column index of each entry; each entry must be stored.
+
+    Returns:
+        np.ndarray: The positions of the entries in `A.data`.
+    """
+    return np.array([A.indptr[r] + np.searchsorted(A.indices[A.indptr[r]:A.indptr[r + 1]], c)
+                     for r, c in zip(rows, cols)])
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _score_candidates_kernel(L_plus, edge_resistances, u_idx, v_idx, scale,
+                                 candidates, degrees, d_bar):
+        """Numba version of the batch scoring in `_score_edge_removals`."""
+        n, m = degrees.shape[0], u_idx.shape[0]
+        denominator = 2 * n * d_bar
+        rs = np.empty(candidates.shape[0])
+        for c in prange(candidates.shape[0]):
+            e = candidates[c]
+            a, b = u_idx[e], v_idx[e]
+
+            # Rs = (log(T) * sum(omega * w) - sum(omega * w * log(omega))) / T
+            # with T = sum(omega), accumulated in a single pass over the edges
+            total = 0.0
+            weighted = 0.0
+            weighted_log = 0.0
+            for f in range(m):
+                if f == e:
+                    continue
+                # b_f^T L+ b_e, read from L+ directly rather than through
+                # a per-candidate copy of L+[a] - L+[b]
+                p, q = u_idx[f], v_idx[f]
+                cross = L_plus[a, p] - L_plus[b, p] - L_plus[a, q] + L_plus[b, q]
+                omega = edge_resistances[f] + scale[e] * cross * cross
+                if omega <= 0.0:
+                    continue
+                dev_p = abs(degrees[p] - (p == a or p == b) - d_bar)
+                dev_q = abs(degrees[q] - (q == a or q == b) - d_bar)
+                w = 1.0 - (dev_p + dev_q) / denominator
+                total += omega
+                weighted += omega * w
+                weighted_log += omega * w * np.log(omega)
+            rs[c] = (np.log(total) * weighted - weighted_log) / total
+        return rs
+else:
+    _score_candidates_kernel = None
+
+def _cut_components(A, i, j):
+    """
+    Labels the connected components of a graph after removing edge (i, j).
+
+    Args:
+        A (scipy.sparse.csr_matrix): Adjacency matrix with sorted indices.
+        i (int): Row index of the first endpoint of the edge.
+        j (int): Row index of the second endpoint of the edge.
+
+    Returns:
+        tuple: (labels, largest_label), the component label of each node and
+               the label of the largest component.
+    """
+    # csgraph treats explicitly stored zeros as edges, so they are eliminated
+    A_cut = A.copy()
+    A_cut.data[_csr_positions(A_cut, [i, j], [j, i])] = 0
+    A_cut.eliminate_zeros()
+    _, labels = connected_components(A_cut, directed=False)
+    return labels, np.bincount(labels).argmax()
+
+def _score_edge_removals(L_plus, edge_resistances, u_idx, v_idx, edge_weights, degrees,
+                         block_size=256):
+    """
+    Computes Rs after the removal of each edge of a connected graph.
+
+    Removing an edge (u, v) of weight w changes L by -w * b b^T with
+    b = e_u - e_v. By Sherman-Morrison, as long as the graph stays connected,
+    the resistance of every other edge e becomes
+    Omega_e + w * (b^T L+ b_e)^2 / (1 - w * Omega_uv). All cross terms
+    b^T L+ b_e are obtained from one sparse-dense product B @ L+ with the
+    (m x n) incidence matrix B, and the candidates are scored with NumPy
+    reductions along the rows, a block of rows at a time. When Numba is
+    installed, the candidates are instead scored in parallel by a compiled
+    kernel.
+
+    Args:
+        L_plus (np.ndarray): The pseudoinverse of the Laplacian.
+        edge_resistances (np.ndarray): Effective resistance of each edge.
+        u_idx (np.ndarray): Node index of the first endpoint of each edge.
+        v_idx (np.ndarray): Node index of the second endpoint of each edge.
+        edge_weights (np.ndarray): Weight of each edge in the Laplacian.
+        degrees (np.ndarray): Degree of each node.
+        block_size (int): Number of candidates scored per batch.
+
+    Returns:
+        tuple: A tuple containing:
+            - rs (np.ndarray): The Rs value after removing each edge.
+            - is_bridge (np.ndarray): True for edges whose removal disconnects
+              the graph. Their `rs` entries are not meaningful.
+    """
+    n, m = len(degrees), len(u_idx)
+    w_omega = edge_weights * edge_resistances
+    is_bridge = w_omega >= 1 - 1e-9
+    rs = np.zeros(m)
+    candidates = np.flatnonzero(~is_bridge)
+    if len(candidates) == 0:
+        return rs, is_bridge
+    scale = edge_weights / np.where(is_bridge, 1.0, 1 - w_omega)
+
+    # Every candidate removes one edge and keeps all nodes, so the new average
+    # degree is shared. Only edges touching the removed one see their w_uv
+    # change, by the change in deviation of the shared endpoint.
+    d_bar = (degrees.sum() - 2) / n
+    if _score_candidates_kernel is not None:
+        rs[candidates] = _score_candidates_kernel(
+            L_plus, edge_resistances, u_idx, v_idx, scale, candidates,
+            degrees.astype(np.float64), d_bar)
+        return rs, is_bridge
+
+    rows = np.arange(m)
+    B = sp.csr_matrix((np.concatenate([np.ones(m), -np.ones(m)]),
+                       (np.concatenate([rows, rows]), np.concatenate([u_idx, v_idx]))),
+                      shape=(m, n))
+    B_abs = abs(B)
+    deviation = np.abs(degrees - d_bar)
+    denominator = 2 * n * d_bar
+    base_weights = 1 - (deviation[u_idx] + deviation[v_idx]) / denominator
+    shared_endpoint = B_abs @ sp.diags(np.abs(degrees - 1 - d_bar) - deviation) @ B_abs.T
+
+    # Scratch buffers for one block, reused across blocks
+    rows_per_block = min(block_size, len(candidates))
+    p = np.empty((rows_per_block, m))
+    term = np.empty((rows_per_block, m))
+    weights = np.empty((rows_per_block, m))
+
+    for start in range(0, len(candidates), block_size):
+        block = candidates[start:start + block_size]
+        r = len(block)
+        Y = B[block] @ L_plus
+
+        # p holds b_e^T L+ b_f, then the new resistances, then their shares
+        np.take(Y, u_idx, axis=1, out=p[:r])
+        np.take(Y, v_idx, axis=1, out=term[:r])
+        np.subtract(p[:r], term[:r], out=p[:r])
+        np.square(p[:r], out=p[:r])
+        p[:r] *= scale[block, None]
+        p[:r] += edge_resistances
+        p[np.arange(r), block] = 0.0
+        p[:r] /= p[:r].sum(axis=1, keepdims=True)
+
+        np.subtract(base_weights, shared_endpoint[block].toarray() / denominator,
+                    out=weights[:r])
+        term[:r] = 0.0
+        np.log(p[:r], out=term[:r], where=p[:r] > 0)
+        term[:r] *= p[:r]
+        term[:r] *= weights[:r]
+        rs[block] = -term[:r].sum(axis=1)
+
+    return rs, is_bridge
+
 def find_optimal_targets_greedy(G, num_targets=1, budget=None):
     """
     Finds the optimal set of edges (vessel segments) to remove in order to
@@ -64,7 +243,10 @@ def find_optimal_targets_greedy(G, num_targets=1, budget=None):
     
     # Calculate initial Rs
     try:
-        initial_rs = calculate_Rs(current_G)
+        if _is_unweighted(current_G):
+            initial_rs = calculate_Rs_unweighted(current_G)
+        else:
+            initial_rs = calculate_Rs(current_G)
     except ValueError as e:
         print(f"Could not calculate initial Rs: {e}")
         return [], [], G
@@ -79,8 +261,22 @@ def find_optimal_targets_greedy(G, num_targets=1, budget=None):
 
     print(f"Starting greedy search for {iterations} targets. Initial Rs: {initial_rs:.4f}")
 
+    # The node set never changes; degrees are kept up to date as edges are removed
+    nodes = list(current_G.nodes())
+    node_index = {node: k for k, node in enumerate(nodes)}
+    n_nodes = len(nodes)
+    node_degrees = np.array([d for _, d in current_G.degree(nodes)])
+
+    # The candidate list and the endpoint arrays are built once and kept
+    # aligned, in G.edges() order; removing an edge preserves the order of
+    # the others, so ties are still broken as in a scan over current_G.edges()
+    candidate_edges = list(current_G.edges())
+    all_weights = np.array([w for _, _, w in current_G.edges(data="weight", default=1)],
+                           dtype=np.float64)
+    edge_u = np.array([node_index[u] for u, _ in candidate_edges], dtype=np.int32)
+    edge_v = np.array([node_index[v] for _, v in candidate_edges], dtype=np.int32)
+
     for i in range(iterations):
-        candidate_edges = list(current_G.edges())
         best_edge_to_remove = None
         max_delta_rs = -np.inf
         next_rs = initial_rs
@@ -89,36 +285,96 @@ def find_optimal_targets_greedy(G, num_targets=1, budget=None):
             print("No more edges to remove.")
             break
 
-        # Iterate through all possible edges to find the best one to remove
-        for edge in candidate_edges:
-            temp_G = current_G.copy()
-            temp_G.remove_edge(*edge)
-
-            # Important: The Rs metric is defined for a CONNECTED graph.
-            # The goal of the therapy is to fragment the network.
-            # We calculate Rs on the largest remaining connected component.
-            if not nx.is_connected(temp_G):
-                largest_cc_nodes = max(nx.connected_components(temp_G), key=len)
-                largest_cc_graph = temp_G.subgraph(largest_cc_nodes)
-            else:
-                largest_cc_graph = temp_G
-
-            # If the removal shatters the graph into tiny pieces, Rs might be 0
-            if largest_cc_graph.number_of_edges() == 0:
-                rs_after_removal = 0.0
-            else:
-                try:
-                    rs_after_removal = calculate_Rs(largest_cc_graph)
-                except ValueError:
-                    # This can happen if a component becomes invalid for Rs calculation
-                    continue
-            
-            delta_rs = rs_after_removal - initial_rs
-            
-            if delta_rs > max_delta_rs:
-                max_delta_rs = delta_rs
-                best_edge_to_remove = edge
-                next_rs = rs_after_removal
+        # Rs is measured on the largest connected component. Removing an edge
+        # outside of it leaves that component, and therefore Rs, unchanged.
+        n_edges = len(candidate_edges)
+        A = sp.csr_matrix((np.ones(2 * n_edges), (np.concatenate([edge_u, edge_v]),
+                                                  np.concatenate([edge_v, edge_u]))),
+                          shape=(n_nodes, n_nodes))
+        A.sort_indices()
+        _, labels = connected_components(A, directed=False)
+        in_main = labels == np.bincount(labels).argmax()
+        main_positions = np.flatnonzero(in_main)
+        n_main = len(main_positions)
+        node_map = np.full(n_nodes, -1, dtype=np.int32)
+        node_map[main_positions] = np.arange(n_main)
+
+        # Cache L+ of the component once per round and score every removal
+        # that keeps it connected in one batch. An edge is in the component
+        # iff its first endpoint is; main_pos[k] is its candidate position.
+        main_pos = np.flatnonzero(in_main[edge_u])
+        u_idx = node_map[edge_u[main_pos]]
+        v_idx = node_map[edge_v[main_pos]]
+        edge_weights = all_weights[main_pos]
+        degrees = node_degrees[main_positions]
+
+        # The component's Laplacian, with the diagonal stored
+        diag = np.arange(n_main)
+        L_csr = sp.csr_matrix(
+            (np.concatenate([-edge_weights, -edge_weights,
+                             np.bincount(u_idx, edge_weights, n_main)
+                             + np.bincount(v_idx, edge_weights, n_main)]),
+             (np.concatenate([u_idx, v_idx, diag]), np.concatenate([v_idx, u_idx, diag]))),
+            shape=(n_main, n_main),
+        )
+        L_csr.sum_duplicates()
+
+        # Candidates outside the component keep the current Rs
+        rs_after = np.full(n_edges, initial_rs)
+        if len(main_pos):
+            L_plus = calculate_laplacian_pseudoinverse(L_csr)
+            edge_resistances = np.maximum(
+                L_plus[u_idx, u_idx] + L_plus[v_idx, v_idx] - 2 * L_plus[u_idx, v_idx], 0.0)
+            rs_without_edge, is_bridge = _score_edge_removals(
+                L_plus, edge_resistances, u_idx, v_idx, edge_weights, degrees)
+            rs_after[main_pos] = rs_without_edge
+
+            for k in np.flatnonzero(is_bridge):
+                pos = main_pos[k]
+                a, b = u_idx[k], v_idx[k]
+
+                # The edge is a bridge. The goal of the therapy is to fragment
+                # the network, so Rs is taken on the largest remaining component.
+                ga, gb = main_positions[a], main_positions[b]
+                cut_labels, largest_label = _cut_components(A, ga, gb)
+
+                if largest_label in (cut_labels[ga], cut_labels[gb]):
+                    # Part of the current component survives as the largest
+                    # one. No current crosses a bridge, so the resistances
+                    # of the surviving edges are those already computed.
+                    sub = np.flatnonzero(cut_labels[main_positions] == largest_label)
+                    remap = np.full(n_main, -1, dtype=np.intp)
+                    remap[sub] = np.arange(len(sub))
+                    sel = (remap[u_idx] >= 0) & (remap[v_idx] >= 0)
+                    sel[k] = False
+
+                    # If the removal shatters the graph into tiny pieces, Rs might be 0
+                    if not sel.any():
+                        rs_after[pos] = 0.0
+                    else:
+                        new_degrees = degrees.copy()
+                        new_degrees[a] -= 1
+                        new_degrees[b] -= 1
+                        rs_after[pos] = _rs_from_resistances(
+                            edge_resistances[sel], new_degrees[sub],
+                            remap[u_idx[sel]], remap[v_idx[sel]])
+                else:
+                    # Another component of the graph is now the largest one
+                    largest_cc_graph = current_G.subgraph(
+                        [nodes[p] for p in np.flatnonzero(cut_labels == largest_label)])
+                    if largest_cc_graph.number_of_edges() == 0:
+                        rs_after[pos] = 0.0
+                    else:
+                        # -inf if the component is invalid for Rs calculation,
+                        # which excludes the candidate
+                        rs_after[pos] = _calculate_Rs_nothrow(largest_cc_graph)
+
+        # The first candidate with the largest Rs wins, as in a sequential scan
+        best = int(np.argmax(rs_after))
+        if np.isfinite(rs_after[best]):
+            best_edge_to_remove = candidate_edges[best]
+            next_rs = float(rs_after[best])
+            max_delta_rs = next_rs - initial_rs
 
         if best_edge_to_remove is None:
             print("No beneficial edge removal found. Stopping.")
@@ -126,6 +382,12 @@ def find_optimal_targets_greedy(G, num_targets=1, budget=None):
 
         # Permanently remove the best edge found in this iteration
         current_G.remove_edge(*best_edge_to_remove)
+        node_degrees[edge_u[best]] -= 1
+        node_degrees[edge_v[best]] -= 1
+        del candidate_edges[best]
+        all_weights = np.delete(all_weights, best)
+        edge_u = np.delete(edge_u, best)
+        edge_v = np.delete(edge_v, best)
         
         # Update state
         initial_rs = next_rs # The new baseline Rs is the one from the new graph state
@@ -1,59 +1,359 @@
 # src/calculate_Rs.py
 
+import math
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import LinearOperator, cg, splu
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; the NumPy kernels are used without it
+    njit = None
 
 def calculate_laplacian_pseudoinverse(G):
     """
     Calculates the Moore-Penrose pseudoinverse of the graph's Laplacian matrix.
     This is a key step for calculating effective resistance.
 
+    The Laplacian stays sparse unless the graph is small and dense enough for
+    the eigendecomposition to be faster; only L+ itself is dense.
+
     Args:
-        G (nx.Graph): A connected NetworkX graph.
+        G (nx.Graph or scipy.sparse matrix): A connected NetworkX graph, or
+                                             its Laplacian matrix.
 
     Returns:
         np.ndarray: The pseudoinverse of the Laplacian matrix.
     """
-    if not nx.is_connected(G):
+    if sp.issparse(G):
+        connected = _is_connected(G)
+        L = G
+    else:
+        connected = nx.is_connected(G)
+        L = nx.laplacian_matrix(G)
+    if not connected:
         raise ValueError("Graph must be connected to calculate its Laplacian pseudoinverse.")
-    
-    # Get the graph Laplacian matrix as a dense NumPy array
-    L = nx.laplacian_matrix(G).toarray()
-    
-    # Calculate the Moore-Penrose pseudoinverse
-    L_plus = np.linalg.pinv(L)
-    
+
+    n = L.shape[0]
+    if _use_dense(n, (L.count_nonzero() - n) // 2):
+        # Calculate the Moore-Penrose pseudoinverse from the eigendecomposition
+        V, inv_w = _laplacian_eigh(L.toarray())
+        return (V * inv_w) @ V.T
+
+    # L+ e_j = L+ (e_j - 1/n), so the columns of L+ are solves against the
+    # centred unit vectors, done in blocks to bound the dense right-hand side
+    solve_L = _laplacian_solver(L)
+    L_plus = np.empty((n, n))
+    block = _solve_block_size(n)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        rhs = np.full((n, stop - start), -1.0 / n)
+        rhs[np.arange(start, stop), np.arange(stop - start)] += 1.0
+        L_plus[:, start:stop] = solve_L(rhs)
     return L_plus
 
+def _laplacian_eigh(L):
+    """
+    Eigendecomposes the dense Laplacian of a connected graph.
+
+    L is symmetric positive semi-definite, so `eigh` is used rather than the
+    SVD behind `np.linalg.pinv`. A connected graph has exactly one zero
+    eigenvalue, the smallest one, which is dropped from the inverse spectrum.
+
+    Args:
+        L (np.ndarray): The dense (n x n) Laplacian of a connected graph.
+
+    Returns:
+        tuple: (V, inv_w) such that L+ = V @ diag(inv_w) @ V.T.
+    """
+    w, V = np.linalg.eigh(L)
+    inv_w = np.zeros_like(w)
+    inv_w[1:] = 1.0 / w[1:]
+    return V, inv_w
+
+# The dense eigendecomposition costs O(n^3) whatever the edge count, while a
+# sparse factorization of a tree-like graph is close to linear. Dense is only
+# faster for small graphs with an average degree of at least 4.
+_DENSE_MAX_NODES = 512
+_DENSE_MIN_AVG_DEGREE = 4
+
+# Upper bound on the entries of a dense right-hand side block (128 MB)
+_SOLVE_BLOCK_ENTRIES = 1 << 24
+
+def _use_dense(n, m):
+    """Whether a graph with n nodes and m edges should use the dense path."""
+    return n <= _DENSE_MAX_NODES and 2 * m >= _DENSE_MIN_AVG_DEGREE * n
+
+def _solve_block_size(n):
+    """The number of right-hand sides solved at once for an n-node graph."""
+    return max(1, _SOLVE_BLOCK_ENTRIES // max(n, 1))
+
+def _laplacian_solver(L):
+    """
+    Factorizes the Laplacian of a connected graph for repeated solves.
+
+    The last node is grounded (its row and column are dropped), which leaves
+    a sparse, non-singular matrix. It is factorized once with a sparse LU.
+
+    Args:
+        L (scipy.sparse matrix): The (n x n) Laplacian of a connected graph.
+
+    Returns:
+        callable: `_solve_L(b)`, which returns L+ b for a vector or (n x k)
+                  block b whose columns sum to zero.
+    """
+    L_grounded = sp.csc_matrix(L, dtype=np.float64)[:-1, :-1]
+    lu = splu(L_grounded, permc_spec="MMD_AT_PLUS_A")
+
+    def _solve_L(b):
+        x = np.zeros(b.shape)
+        x[:-1] = lu.solve(np.ascontiguousarray(b[:-1]))
+        # The grounded solution differs from L+ b by a constant
+        x -= x.mean(axis=0)
+        return x
+
+    return _solve_L
+
+def _effective_resistances(L, u_idx, v_idx):
+    """
+    Computes Omega_uv for the given index pairs from the Laplacian.
+
+    Small, dense graphs use the eigendecomposition directly, as
+    Omega_uv = sum_k (V[u, k] - V[v, k])^2 / w_k, without materializing L+.
+    Other graphs use sparse solves.
+
+    Args:
+        L (scipy.sparse matrix): The (n x n) Laplacian of a connected graph.
+        u_idx (np.ndarray): Row indices of the first endpoint of each edge.
+        v_idx (np.ndarray): Row indices of the second endpoint of each edge.
+
+    Returns:
+        np.ndarray: The effective resistance of each (u, v) pair.
+    """
+    if not _use_dense(L.shape[0], len(u_idx)):
+        return _grounded_effective_resistances(L, u_idx, v_idx)
+
+    V, inv_w = _laplacian_eigh(L.toarray())
+    diffs = V[u_idx] - V[v_idx]
+    omega = np.einsum("ek,k->e", diffs ** 2, inv_w)
+    return np.maximum(omega, 0.0)
+
+def _grounded_effective_resistances(L, u_idx, v_idx):
+    """
+    Computes Omega_uv for the given index pairs by solving Laplacian systems.
+
+    The Laplacian is factorized once and back-solved against the incidence
+    vectors e_u - e_v, in blocks of edges so that the dense right-hand side
+    stays bounded, and the dense pseudoinverse is never formed.
+
+    Args:
+        L (scipy.sparse matrix): The (n x n) Laplacian of a connected graph.
+        u_idx (np.ndarray): Row indices of the first endpoint of each edge.
+        v_idx (np.ndarray): Row indices of the second endpoint of each edge.
+
+    Returns:
+        np.ndarray: The effective resistance of each (u, v) pair.
+    """
+    n = L.shape[0]
+    m = len(u_idx)
+    if n < 2 or m == 0:
+        return np.zeros(m)
+
+    solve_L = _laplacian_solver(L)
+    omega = np.empty(m)
+    block = _solve_block_size(n)
+    for start in range(0, m, block):
+        u, v = u_idx[start:start + block], v_idx[start:start + block]
+        cols = np.arange(len(u))
+        rhs = np.zeros((n, len(u)))
+        rhs[u, cols] = 1.0
+        rhs[v, cols] = -1.0
+        X = solve_L(rhs)
+
+        # Omega_uv = (e_u - e_v)^T L^+ (e_u - e_v), read off the solved potentials
+        omega[start:start + block] = X[u, cols] - X[v, cols]
+    return np.maximum(omega, 0.0)
+
 def calculate_all_pairs_effective_resistance(G, L_plus=None):
     """
     Calculates the effective resistance (Omega_uv) for all edges in the graph.
     The formula used is: Omega_uv = L+_uu + L+_vv - 2*L+_uv
 
+    If no pseudoinverse is supplied, the resistances are obtained from the
+    Laplacian without forming L+ explicitly.
+
     Args:
         G (nx.Graph): A connected NetworkX graph.
         L_plus (np.ndarray, optional): Pre-computed pseudoinverse of the Laplacian.
-                                       If None, it will be computed automatically.
+                                       If None, the resistances are computed
+                                       directly from the Laplacian.
 
     Returns:
         dict: A dictionary where keys are edge tuples (u, v) and values are
               the effective resistance Omega_uv.
     """
-    if L_plus is None:
-        L_plus = calculate_laplacian_pseudoinverse(G)
-        
     # Create a mapping from node labels to matrix indices
     nodes = list(G.nodes())
     node_map = {node: i for i, node in enumerate(nodes)}
-    
-    resistances = {}
-    for u, v in G.edges():
-        i, j = node_map[u], node_map[v]
-        omega_uv = L_plus[i, i] + L_plus[j, j] - 2 * L_plus[i, j]
+
+    edges = list(G.edges())
+    u_idx = np.fromiter((node_map[u] for u, _ in edges), dtype=np.intp, count=len(edges))
+    v_idx = np.fromiter((node_map[v] for _, v in edges), dtype=np.intp, count=len(edges))
+
+    if L_plus is None:
+        if not nx.is_connected(G):
+            raise ValueError("Graph must be connected to calculate effective resistances.")
+        L = nx.laplacian_matrix(G, nodelist=nodes).astype(np.float64).tocsc()
+        omega = _effective_resistances(L, u_idx, v_idx)
+    else:
+        omega = L_plus[u_idx, u_idx] + L_plus[v_idx, v_idx] - 2 * L_plus[u_idx, v_idx]
         # Resistance cannot be negative; floating point errors can make it tiny negative
-        resistances[(u, v)] = max(0, omega_uv)
-        
-    return resistances
+        omega = np.maximum(omega, 0.0)
+
+    return dict(zip(edges, omega.tolist()))
+
+def _sketched_effective_resistances(L, u_idx, v_idx, eps=0.1, seed=None):
+    """
+    Approximates Omega_uv for the given index pairs with the Spielman-Srivastava
+    Johnson-Lindenstrauss sketch.
+
+    With B the (m x n) incidence matrix and W the diagonal of edge weights,
+    Omega_uv = ||W^1/2 B L+ (e_u - e_v)||^2. A random (k x m) projection Q with
+    entries +-1/sqrt(k), k = ceil(24 * log(n) / eps^2), preserves these norms
+    to within a factor (1 +- eps). The k rows of Z = Q W^1/2 B L+ are obtained
+    by conjugate gradient solves against L + 11^T / n with a Jacobi
+    preconditioner. The projection is streamed in blocks of columns, so that
+    memory stays O((n + m) * block) rather than O((n + m) * k). The sketch
+    only pays off for k < n; otherwise the exact resistances are returned.
+
+    Args:
+        L (scipy.sparse matrix): The (n x n) Laplacian of a connected graph.
+        u_idx (np.ndarray): Row indices of the first endpoint of each edge.
+        v_idx (np.ndarray): Row indices of the second endpoint of each edge.
+        eps (float): Relative accuracy of the approximation.
+        seed (int, optional): Seed for the random projection.
+
+    Returns:
+        np.ndarray: The approximate effective resistance of each (u, v) pair.
+    """
+    n, m = L.shape[0], len(u_idx)
+    k = math.ceil(24 * math.log(n) / eps ** 2) if n > 1 else n
+    if k >= n or m == 0:
+        return _effective_resistances(L, u_idx, v_idx)
+
+    L = sp.csr_matrix(L, dtype=np.float64)
+    edge_weights = -np.asarray(L[u_idx, v_idx]).ravel()
+
+    # W^1/2 B as a sparse (m x n) matrix
+    rows = np.arange(m)
+    sqrt_w = np.sqrt(edge_weights)
+    WB = sp.csr_matrix((np.concatenate([sqrt_w, -sqrt_w]),
+                        (np.concatenate([rows, rows]), np.concatenate([u_idx, v_idx]))),
+                       shape=(m, n))
+    rng = np.random.default_rng(seed)
+
+    # Each column y of Y = B^T W^1/2 Q sums to zero, so solving against the
+    # rank-1 regularized Laplacian returns L+ y
+    regularized = LinearOperator(
+        (n, n), matvec=lambda x: L @ x + x.sum() / n, dtype=np.float64)
+    inv_diag = 1.0 / (L.diagonal() + 1.0 / n)
+    jacobi = LinearOperator((n, n), matvec=lambda x: inv_diag * x, dtype=np.float64)
+
+    # Omega_uv is the sum over the k projections of (Z[u] - Z[v])^2, so each
+    # block of Q is drawn, solved and accumulated before the next one
+    omega = np.zeros(m)
+    block = max(1, _SOLVE_BLOCK_ENTRIES // (n + m))
+    Z = np.empty((n, min(block, k)))
+    for start in range(0, k, block):
+        width = min(block, k - start)
+        Q = rng.choice([-1.0, 1.0], size=(m, width)) / math.sqrt(k)
+        Y = WB.T @ Q
+        for i in range(width):
+            Z[:, i], info = cg(regularized, Y[:, i], M=jacobi, rtol=1e-8)
+            if info != 0:
+                raise RuntimeError(
+                    f"Conjugate gradient did not converge in the resistance sketch (info={info}).")
+        diffs = Z[u_idx, :width] - Z[v_idx, :width]
+        omega += np.einsum("ek,ek->e", diffs, diffs)
+    return omega
+
+def calculate_all_pairs_effective_resistance_approx(G, eps=0.1, seed=None):
+    """
+    Approximates the effective resistance (Omega_uv) for all edges in the graph.
+
+    Each resistance is within a factor (1 +- eps) of the exact value with high
+    probability, in roughly O(m log(n) / eps^2) time. This is intended for
+    large graphs where the exact computation is too slow or runs out of memory.
+
+    Args:
+        G (nx.Graph): A connected NetworkX graph.
+        eps (float): Relative accuracy of the approximation.
+        seed (int, optional): Seed for the random projection.
+
+    Returns:
+        dict: A dictionary where keys are edge tuples (u, v) and values are
+              the approximate effective resistance Omega_uv.
+    """
+    if not nx.is_connected(G):
+        raise ValueError("Graph must be connected to calculate effective resistances.")
+
+    edges = list(G.edges())
+    u_idx, v_idx = _edge_index_arrays(G)
+    L = nx.laplacian_matrix(G).astype(np.float64)
+    omega = _sketched_effective_resistances(L, u_idx, v_idx, eps=eps, seed=seed)
+    return dict(zip(edges, omega.tolist()))
+
+def _structural_penalty_weights_numpy(u_arr, v_arr, deg, d_bar):
+    """NumPy version of `_structural_penalty_weights_kernel`."""
+    denominator = 2 * len(deg) * d_bar
+    return 1.0 - (np.abs(deg[u_arr] - d_bar) + np.abs(deg[v_arr] - d_bar)) / denominator
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _structural_penalty_weights_kernel(u_arr, v_arr, deg, d_bar):
+        denominator = 2 * deg.shape[0] * d_bar
+        weights = np.empty(u_arr.shape[0], dtype=np.float64)
+        for e in prange(u_arr.shape[0]):
+            numerator = abs(deg[u_arr[e]] - d_bar) + abs(deg[v_arr[e]] - d_bar)
+            weights[e] = 1.0 - numerator / denominator
+        return weights
+else:
+    _structural_penalty_weights_kernel = _structural_penalty_weights_numpy
+
+def _structural_penalty_weights(u_arr, v_arr, deg):
+    """
+    Computes w_uv for every edge from arrays of endpoint indices.
+
+    Args:
+        u_arr (np.ndarray): Node index of the first endpoint of each edge.
+        v_arr (np.ndarray): Node index of the second endpoint of each edge.
+        deg (np.ndarray): Degree of each node, as float64.
+
+    Returns:
+        np.ndarray: The structural penalty weight of each edge, in edge order.
+    """
+    d_bar = deg.sum() / len(deg) # Average degree
+    if d_bar == 0: # Handle graph with no edges
+        return np.ones(len(u_arr))
+    return _structural_penalty_weights_kernel(u_arr, v_arr, deg, d_bar)
+
+def _edge_index_arrays(G):
+    """
+    Returns the edges of G as two int32 arrays of node indices.
+
+    Args:
+        G (nx.Graph): A NetworkX graph.
+
+    Returns:
+        tuple: (u_arr, v_arr), aligned with the order of G.edges().
+    """
+    node_map = {node: i for i, node in enumerate(G.nodes())}
+    m = G.number_of_edges()
+    u_arr = np.fromiter((node_map[u] for u, _ in G.edges()), dtype=np.int32, count=m)
+    v_arr = np.fromiter((node_map[v] for _, v in G.edges()), dtype=np.int32, count=m)
+    return u_arr, v_arr
 
 def calculate_structural_penalty_weights(G):
     """
@@ -70,68 +370,193 @@ def calculate_structural_penalty_weights(G):
     N = G.number_of_nodes()
     if N == 0 or G.number_of_edges() == 0:
         return {} # Return empty dict for empty graph
-        
-    degrees = dict(G.degree())
-    d_bar = sum(degrees.values()) / N # Average degree
-    
-    if d_bar == 0: # Handle graph with no edges
-        return {edge: 1.0 for edge in G.edges()}
-
-    weights = {}
-    denominator = 2 * N * d_bar
-    if denominator == 0: # Should not happen if there are edges, but as a safeguard
-        return {edge: 1.0 for edge in G.edges()}
-        
-    for u, v in G.edges():
-        du, dv = degrees[u], degrees[v]
-        numerator = abs(du - d_bar) + abs(dv - d_bar)
-        w_uv = 1 - (numerator / denominator)
-        weights[(u, v)] = w_uv
-        
-    return weights
-
-def calculate_Rs(G):
+
+    u_arr, v_arr = _edge_index_arrays(G)
+    deg = np.bincount(np.concatenate([u_arr, v_arr]), minlength=N).astype(np.float64)
+    weights = _structural_penalty_weights(u_arr, v_arr, deg)
+    return dict(zip(G.edges(), weights.tolist()))
+
+def _rs_from_resistances(omega, degrees, u_idx, v_idx):
+    """
+    Evaluates Rs from per-edge effective resistances and node degrees.
+
+    Mirrors `calculate_Rs`, but works on arrays so that the greedy search can
+    score a candidate removal without building the reduced graph.
+
+    Args:
+        omega (np.ndarray): Effective resistance of each edge.
+        degrees (np.ndarray): Degree of each node of the graph.
+        u_idx (np.ndarray): Node index of the first endpoint of each edge.
+        v_idx (np.ndarray): Node index of the second endpoint of each edge.
+
+    Returns:
+        float: The Rs value.
+    """
+    weights = _structural_penalty_weights(u_idx, v_idx, np.asarray(degrees, dtype=np.float64))
+    return _weighted_entropy(omega, weights)
+
+def _weighted_entropy(omega, weights):
+    """
+    Evaluates Rs from per-edge effective resistances and structural weights.
+
+    Args:
+        omega (np.ndarray): Effective resistance of each edge.
+        weights (np.ndarray): Structural penalty weight w_uv of each edge.
+
+    Returns:
+        float: The Rs value.
+    """
+    # Edge probability distribution (p_uv)
+    total_resistance = omega.sum()
+    if total_resistance == 0:
+        return 0.0 # Avoid division by zero
+    p = omega / total_resistance
+
+    # Sum of p_uv * log(1/p_uv) * w_uv, where the term is 0 if p_uv is 0
+    log_p = np.log(p, out=np.zeros_like(p), where=p > 0)
+    return float(-(p * log_p * weights).sum())
+
+def _laplacian_and_edges(G_or_L):
+    """
+    Returns the Laplacian, node degrees and edge endpoint arrays of a graph.
+
+    Args:
+        G_or_L (nx.Graph or scipy.sparse matrix): A graph, or its Laplacian.
+
+    Returns:
+        tuple: (L, degrees, u_arr, v_arr), with L as a float64 CSC matrix.
+               For a Laplacian input, each stored off-diagonal entry is an edge.
+    """
+    if sp.issparse(G_or_L):
+        L = sp.csc_matrix(G_or_L, dtype=np.float64, copy=True)
+        L.eliminate_zeros()
+        upper = sp.triu(L, k=1).tocoo()
+        u_arr, v_arr = upper.row.astype(np.int32), upper.col.astype(np.int32)
+    else:
+        u_arr, v_arr = _edge_index_arrays(G_or_L)
+        L = nx.laplacian_matrix(G_or_L).astype(np.float64).tocsc()
+    degrees = np.bincount(np.concatenate([u_arr, v_arr]), minlength=L.shape[0])
+    return L, degrees, u_arr, v_arr
+
+def _is_connected(L):
+    """Checks connectivity of the graph with Laplacian (or adjacency) L."""
+    n = L.shape[0]
+    return n > 0 and connected_components(L, directed=False, return_labels=False) == 1
+
+def calculate_Rs(G_or_L, *, check=True, approx=False, eps=0.1, seed=None):
     """
     Calculates the Structurally-Weighted Resistance Entropy (Rs) for a given graph.
     This is the main function that orchestrates the calculation.
     Rs(G) = sum_{u,v in E} [ p_uv * log(1/p_uv) * w_uv ]
 
     Args:
-        G (nx.Graph): A connected NetworkX graph.
+        G_or_L (nx.Graph or scipy.sparse matrix): A connected NetworkX graph,
+                                                  or its Laplacian matrix.
+        check (bool): If True, raise a ValueError for a disconnected graph.
+                      Pass False only if the graph is known to be connected.
+        approx (bool): If True, approximate the effective resistances with a
+                       random sketch, for large graphs where the exact
+                       computation is too slow or runs out of memory.
+        eps (float): Relative accuracy of the approximate resistances.
+        seed (int, optional): Seed for the random sketch, to make approximate
+                              values reproducible.
 
     Returns:
         float: The calculated Rs value for the graph.
                Returns 0 if the graph has no edges.
     """
-    if not nx.is_connected(G):
+    L, degrees, u_arr, v_arr = _laplacian_and_edges(G_or_L)
+
+    if check and not _is_connected(L):
         # The Rs metric as defined relies on effective resistance, which is for connected graphs.
         raise ValueError("Rs calculation requires a connected graph.")
 
-    if G.number_of_edges() == 0:
+    if len(u_arr) == 0:
         return 0.0
 
-    # Step 1: Calculate effective resistances (Omega_uv)
-    edge_resistances = calculate_all_pairs_effective_resistance(G)
-    
-    # Step 2: Calculate the edge probability distribution (p_uv)
-    total_resistance = sum(edge_resistances.values())
-    if total_resistance == 0:
-        return 0.0 # Avoid division by zero
-        
-    edge_probabilities = {edge: res / total_resistance for edge, res in edge_resistances.items()}
-
-    # Step 3: Calculate structural penalty weights (w_uv)
-    structural_weights = calculate_structural_penalty_weights(G)
-
-    # Step 4: Calculate Rs by summing the contributions of each edge
-    Rs_value = 0.0
-    for edge in G.edges():
-        p_uv = edge_probabilities.get(edge)
-        w_uv = structural_weights.get(edge)
-
-        # The term is p_uv * log(1/p_uv). If p_uv is 0, this term is 0.
-        if p_uv is not None and w_uv is not None and p_uv > 0:
-            spectral_flow_term = p_uv * np.log(1 / p_uv)
-            Rs_value += spectral_flow_term * w_uv
-            
-    return Rs_value
+    # Step 1: Calculate effective resistances (Omega_uv), aligned with the edge arrays
+    if approx:
+        edge_resistances = _sketched_effective_resistances(L, u_arr, v_arr, eps=eps, seed=seed)
+    else:
+        edge_resistances = _effective_resistances(L, u_arr, v_arr)
+
+    # Steps 2-4: Calculate p_uv and w_uv, and sum the contribution of each edge
+    return _rs_from_resistances(edge_resistances, degrees, u_arr, v_arr)
+
+def _is_unweighted(G):
+    """
+    Whether every edge of G counts as 1, i.e. has no weight or a weight of 1.
+
+    Graphs built from an adjacency matrix, such as the vascular networks of
+    `reconstruct_vascular_network`, store weight 1 on every edge.
+    """
+    return all(data.get("weight", 1) == 1 for _, _, data in G.edges(data=True))
+
+def _unweighted_laplacian(G):
+    """
+    Builds the Laplacian of an unweighted (or unit-weight) graph from its
+    degrees and edges.
+
+    This skips NetworkX's weight-aware Laplacian. The entries are small
+    integers, stored as int32 and only promoted to float64 by the solvers.
+
+    Args:
+        G (nx.Graph): A NetworkX graph whose edges all count as 1.
+
+    Returns:
+        tuple: (L, degrees, u_arr, v_arr), with L as an int32 CSR matrix.
+    """
+    u_arr, v_arr = _edge_index_arrays(G)
+    n, m = G.number_of_nodes(), len(u_arr)
+    degrees = np.bincount(np.concatenate([u_arr, v_arr]), minlength=n)
+    diag = np.arange(n, dtype=np.int32)
+    L = sp.csr_matrix(
+        (np.concatenate([np.full(2 * m, -1, dtype=np.int32), degrees.astype(np.int32)]),
+         (np.concatenate([u_arr, v_arr, diag]), np.concatenate([v_arr, u_arr, diag]))),
+        shape=(n, n),
+    )
+    return L, degrees, u_arr, v_arr
+
+def calculate_Rs_unweighted(G, *, check=True):
+    """
+    Calculates Rs for a graph without edge weights, or with unit weights.
+
+    Gives the same value as `calculate_Rs`, with the Laplacian built directly
+    from the degrees and the adjacency as an integer sparse matrix.
+
+    Args:
+        G (nx.Graph): A connected NetworkX graph whose edges all count as 1.
+        check (bool): If True, raise a ValueError for a disconnected graph.
+
+    Returns:
+        float: The calculated Rs value for the graph.
+               Returns 0 if the graph has no edges.
+    """
+    L, degrees, u_arr, v_arr = _unweighted_laplacian(G)
+
+    if check and not _is_connected(L):
+        raise ValueError("Rs calculation requires a connected graph.")
+
+    if len(u_arr) == 0:
+        return 0.0
+
+    edge_resistances = _effective_resistances(L, u_arr, v_arr)
+    return _rs_from_resistances(edge_resistances, degrees, u_arr, v_arr)
+
+def _calculate_Rs_nothrow(G_or_L):
+    """
+    Variant of `calculate_Rs` for hot loops that never raises.
+
+    Args:
+        G_or_L (nx.Graph or scipy.sparse matrix): A graph, or its Laplacian.
+
+    Returns:
+        float: The Rs value, or -inf if the graph is not connected.
+    """
+    L, degrees, u_arr, v_arr = _laplacian_and_edges(G_or_L)
+    if not _is_connected(L):
+        return -np.inf
+    if len(u_arr) == 0:
+        return 0.0
+    edge_resistances = _effective_resistances(L, u_arr, v_arr)
+    return _rs_from_resistances(edge_resistances, degrees, u_arr, v_arr)
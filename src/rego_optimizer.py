@@ -1,9 +1,32 @@
 # src/rego_optimizer.py
 
 import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
 import random
-import copy
-from .calculate_Rs import calculate_Rs
+from .calculate_Rs import (calculate_Rs, calculate_Rs_unweighted,
+                           calculate_laplacian_pseudoinverse, _is_unweighted,
+                           _structural_penalty_weights, _unweighted_laplacian,
+                           _weighted_entropy)
+
+# Bound once, as it is called up to 200 times per iteration
+_randrange = random.randrange
+
+def _edges_connected(u_arr, v_arr, n_nodes):
+    """
+    Checks connectivity of the graph given by two arrays of edge endpoints.
+
+    Args:
+        u_arr (np.ndarray): Node index of the first endpoint of each edge.
+        v_arr (np.ndarray): Node index of the second endpoint of each edge.
+        n_nodes (int): The number of nodes in the graph.
+
+    Returns:
+        bool: True if the graph is connected.
+    """
+    A = sp.csr_matrix((np.ones(len(u_arr)), (u_arr, v_arr)), shape=(n_nodes, n_nodes))
+    return connected_components(A, directed=False, return_labels=False) == 1
 
 def rego_optimizer(G_initial, n_iter=1000, verbose=True):
     """
@@ -26,12 +49,17 @@ def rego_optimizer(G_initial, n_iter=1000, verbose=True):
     if not nx.is_connected(G_initial):
         raise ValueError("Initial graph must be connected for REGO optimization.")
 
-    # Create a deep copy to avoid modifying the original graph
-    G = copy.deepcopy(G_initial)
+    # The original graph is never modified. Swaps are applied to an edge list
+    # and the optimized graph is only built when returning.
     
-    # Initial Rs calculation
+    # Initial Rs calculation, without NetworkX's weight-aware Laplacian when
+    # every edge has unit weight
+    unweighted = _is_unweighted(G_initial)
     try:
-        current_rs = calculate_Rs(G)
+        if unweighted:
+            current_rs = calculate_Rs_unweighted(G_initial)
+        else:
+            current_rs = calculate_Rs(G_initial)
     except ValueError as e:
         print(f"Error calculating initial Rs: {e}")
         return G_initial, []
@@ -41,28 +69,65 @@ def rego_optimizer(G_initial, n_iter=1000, verbose=True):
     if verbose:
         print(f"Starting REGO optimization. Initial Rs: {current_rs:.4f}")
 
-    # Get a list of edges to sample from
-    edges = list(G.edges())
+    # The swap proposals work in node index space: edges are sampled from a
+    # list of index pairs, and node labels are only used again when returning
+    nodes = list(G_initial.nodes())
+    node_map = {node: k for k, node in enumerate(nodes)}
+    n_nodes = len(nodes)
+    initial_edges = list(G_initial.edges())
+    edges = [(node_map[a], node_map[b]) for a, b in initial_edges]
     n_edges = len(edges)
+    u_arr = np.array([a for a, _ in edges], dtype=np.intp)
+    v_arr = np.array([b for _, b in edges], dtype=np.intp)
     if n_edges < 2:
         print("Optimization requires at least 2 edges. Returning initial graph.")
-        return G, rs_history
+        return G_initial.copy(), rs_history
+
+    # Neighbour index sets of the current graph, for the multi-edge check
+    neighbors = [{node_map[nbr] for nbr in G_initial.adj[node]} for node in nodes]
+    # Slots of the edge list that were ever overwritten by a swap
+    swapped = np.zeros(n_edges, dtype=bool)
+
+    # Cache L+ and the edge resistances. A swap changes L by a rank-4 term
+    # U C U^T, so trial resistances follow from the Woodbury identity
+    # L+' = L+ - Y K^-1 Y^T with Y = L+ U and K = C^-1 + U^T Y, and L+
+    # itself is only updated when a swap is accepted.
+    edge_weights = np.array([w for _, _, w in G_initial.edges(data="weight", default=1)],
+                            dtype=np.float64)
+    if unweighted:
+        L_plus = calculate_laplacian_pseudoinverse(_unweighted_laplacian(G_initial)[0])
+    else:
+        L_plus = calculate_laplacian_pseudoinverse(G_initial)
+    omega = np.maximum(
+        L_plus[u_arr, u_arr] + L_plus[v_arr, v_arr] - 2 * L_plus[u_arr, v_arr], 0.0)
+
+    # Swaps preserve degrees, so each node's |d_i - d_bar| is fixed and only
+    # the structural weights of the two new edges need computing per trial
+    degrees = np.bincount(np.concatenate([u_arr, v_arr]), minlength=n_nodes).astype(np.float64)
+    d_bar = degrees.sum() / n_nodes
+    per_node_dev = np.abs(degrees - d_bar)
+    denominator = 2 * n_nodes * d_bar
+    structural_weights = _structural_penalty_weights(u_arr, v_arr, degrees)
 
     accepted_swaps = 0
     for i in range(n_iter):
-        # 1. Select two random edges (u, v) and (x, y) for a potential swap.
+        # 1. Select two random edges (a, b) and (c, d) for a potential swap.
         # Ensure the edges do not share any nodes.
         if n_edges < 2: break
         
         # Try to find a valid pair of edges for swapping
         attempts = 0
         while attempts < 100: # Add a limit to prevent infinite loops
-            edge1_idx, edge2_idx = random.sample(range(n_edges), 2)
-            u, v = edges[edge1_idx]
-            x, y = edges[edge2_idx]
+            # Two distinct indices: draw the second from n_edges - 1 slots
+            # and skip over the first
+            edge1_idx = _randrange(n_edges)
+            edge2_idx = _randrange(n_edges - 1)
+            edge2_idx += edge2_idx >= edge1_idx
+            a, b = edges[edge1_idx]
+            c, d = edges[edge2_idx]
             
             # Check if they share any nodes
-            if len({u, v, x, y}) == 4:
+            if a != c and a != d and b != c and b != d:
                 break # Found valid edges to swap
             attempts += 1
         else:
@@ -70,54 +135,77 @@ def rego_optimizer(G_initial, n_iter=1000, verbose=True):
             if verbose: print("Could not find swappable edges. Continuing...")
             continue
             
-        # 2. Propose a swap: (u, v), (x, y) -> (u, y), (v, x)
+        # 2. Propose a swap: (a, b), (c, d) -> (a, d), (b, c)
         # Check if the new edges would create multi-edges.
-        if G.has_edge(u, y) or G.has_edge(v, x):
+        if d in neighbors[a] or c in neighbors[b]:
             continue
 
-        # 3. Temporarily perform the swap
-        G.remove_edge(u, v)
-        G.remove_edge(x, y)
-        G.add_edge(u, y)
-        G.add_edge(v, x)
-
-        # 4. Check connectivity. If disconnected, revert.
-        if not nx.is_connected(G):
-            G.remove_edge(u, y)
-            G.remove_edge(v, x)
-            G.add_edge(u, v)
-            G.add_edge(x, y)
+        # 3. Check connectivity of the swapped graph. If disconnected, skip.
+        trial_u, trial_v = u_arr.copy(), v_arr.copy()
+        trial_u[edge1_idx], trial_v[edge1_idx] = a, d
+        trial_u[edge2_idx], trial_v[edge2_idx] = b, c
+        if not _edges_connected(trial_u, trial_v, n_nodes):
             continue
 
+        # 4. Score the swap without touching the graph. The columns of U are the
+        # incidence vectors of the two removed and the two added edges.
+        Y = np.column_stack([L_plus[:, a] - L_plus[:, b], L_plus[:, c] - L_plus[:, d],
+                             L_plus[:, a] - L_plus[:, d], L_plus[:, b] - L_plus[:, c]])
+        U_rows = np.array([[a, b], [c, d], [a, d], [b, c]])
+        K = np.diag([-1 / edge_weights[edge1_idx], -1 / edge_weights[edge2_idx], 1.0, 1.0])
+        K += Y[U_rows[:, 0]] - Y[U_rows[:, 1]]
+        # K is non-singular because the swapped graph was checked to be connected
+        K_inv = np.linalg.inv(K)
+
+        # Omega'_e = b_e^T L+ b_e - z_e^T K^-1 z_e with z_e = Y^T b_e
+        trial_omega = omega.copy()
+        trial_omega[edge1_idx] = Y[a, 2] - Y[d, 2]
+        trial_omega[edge2_idx] = Y[b, 3] - Y[c, 3]
+        Z = Y[trial_u] - Y[trial_v]
+        trial_omega -= np.einsum("ek,kl,el->e", Z, K_inv, Z)
+        np.maximum(trial_omega, 0.0, out=trial_omega)
+
         # 5. Calculate new Rs and decide
-        try:
-            new_rs = calculate_Rs(G)
-        except ValueError:
-            G.remove_edge(u, y)
-            G.remove_edge(v, x)
-            G.add_edge(u, v)
-            G.add_edge(x, y)
-            continue
-            
+        trial_weights = structural_weights.copy()
+        trial_weights[edge1_idx] = 1 - (per_node_dev[a] + per_node_dev[d]) / denominator
+        trial_weights[edge2_idx] = 1 - (per_node_dev[b] + per_node_dev[c]) / denominator
+        new_rs = _weighted_entropy(trial_omega, trial_weights)
+
         if new_rs > current_rs:
             # Accept the swap
             current_rs = new_rs
             rs_history.append(current_rs)
-            edges = list(G.edges()) # Update edge list
-            n_edges = len(edges)
+            for p, q in ((a, b), (c, d)):
+                neighbors[p].remove(q)
+                neighbors[q].remove(p)
+            for p, q in ((a, d), (b, c)):
+                neighbors[p].add(q)
+                neighbors[q].add(p)
+            L_plus -= Y @ K_inv @ Y.T
+            omega = trial_omega
+            structural_weights = trial_weights
+            # Update the edge list in place: the new edges take the slots of
+            # the ones they replace, so the edge count is unchanged
+            edges[edge1_idx], edges[edge2_idx] = (a, d), (b, c)
+            u_arr, v_arr = trial_u, trial_v
+            edge_weights[edge1_idx] = edge_weights[edge2_idx] = 1.0
+            swapped[edge1_idx] = swapped[edge2_idx] = True
             accepted_swaps += 1
             if verbose and (accepted_swaps % 10 == 0):
                 print(f"Iter {i+1}/{n_iter} | Accepted: {accepted_swaps} | Rs: {current_rs:.4f}")
-        else:
-            # Reject and revert
-            G.remove_edge(u, y)
-            G.remove_edge(v, x)
-            G.add_edge(u, v)
-            G.add_edge(x, y)
 
     if verbose:
         print(f"\nOptimization finished.")
         print(f"Total iterations: {n_iter}, Total accepted swaps: {accepted_swaps}.")
         print(f"Final Rs: {current_rs:.4f}")
 
+    # Build the optimized graph: edges in slots that were never swapped keep
+    # their attributes. Edges in swapped slots were scored with weight 1, so
+    # they are added without attributes, even if they are original edges
+    # that were swapped back in.
+    slots = np.flatnonzero(swapped)
+    G = G_initial.copy()
+    G.remove_edges_from([initial_edges[k] for k in slots])
+    G.add_edges_from([(nodes[edges[k][0]], nodes[edges[k][1]]) for k in slots])
+
     return G, rs_history